@@ -39,13 +39,20 @@ No need for obnoxious openssl tweaking anymore. :)
 """
 
 import base64
+import datetime
+import functools
+import math
 import os
+import random
+import re
+import stat
 import time
 
 from scapy.config import conf, crypto_validator
 from scapy.error import warning
 from scapy.utils import binrepr
 from scapy.asn1.asn1 import ASN1_BIT_STRING
+from scapy.asn1.ber import BER_len_enc
 from scapy.asn1.mib import hash_by_oid
 from scapy.layers.x509 import (
     ECDSAPrivateKey_OpenSSL,
@@ -60,7 +67,7 @@ from scapy.layers.x509 import (
     X509_CRL,
     X509_SubjectPublicKeyInfo,
 )
-from scapy.layers.tls.crypto.pkcs1 import pkcs_os2ip, _get_hash, \
+from scapy.layers.tls.crypto.pkcs1 import _get_hash, \
     _EncryptAndVerifyRSA, _DecryptAndSignRSA
 from scapy.compat import raw, bytes_encode
 
@@ -70,6 +77,45 @@ if conf.crypto_valid:
     from cryptography.hazmat.primitives import serialization
     from cryptography.hazmat.primitives.asymmetric import rsa, ec, x25519
 
+    _BACKEND = default_backend()
+
+    # Public key constructors expecting only the key bits of an SPKI, which
+    # spare cryptography the parsing of the whole SPKI. They are indexed by
+    # named curve OID for ecPublicKey, by algorithm OID for EdDSA. The keys
+    # without a constructor here are left to load_der_public_key().
+    _SPKI_LOADERS = {}
+    try:
+        _SPKI_LOADERS.update({
+            "1.2.840.10045.3.1.7": functools.partial(
+                ec.EllipticCurvePublicKey.from_encoded_point, ec.SECP256R1()),
+            "1.3.132.0.34": functools.partial(
+                ec.EllipticCurvePublicKey.from_encoded_point, ec.SECP384R1()),
+            "1.3.132.0.35": functools.partial(
+                ec.EllipticCurvePublicKey.from_encoded_point, ec.SECP521R1()),
+        })
+    except AttributeError:
+        # cryptography < 2.5
+        pass
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519, ed448
+        _SPKI_LOADERS.update({
+            "1.3.101.112": ed25519.Ed25519PublicKey.from_public_bytes,
+            "1.3.101.113": ed448.Ed448PublicKey.from_public_bytes,
+        })
+    except ImportError:
+        # cryptography < 2.6
+        pass
+
+    # Signature algorithm OID -> hash algorithm object, resolved once and
+    # for all for verifyCert(). Hash algorithm objects are stateless.
+    _SIGALG_TO_HASHOBJ = {}
+    for _oid, _hash_name in hash_by_oid.items():
+        try:
+            _SIGALG_TO_HASHOBJ[_oid] = _get_hash(_hash_name)
+        except KeyError:
+            # unsupported (md2, md4)
+            pass
+
     # cryptography raised the minimum RSA key length to 1024 in 43.0+
     # https://github.com/pyca/cryptography/pull/10278
     # but we need still 512 for EXPORT40 ciphers (yes EXPORT is terrible)
@@ -84,6 +130,16 @@ if conf.crypto_valid:
         _RSA_512_SUPPORTED = False
         from cryptography.hazmat.primitives.asymmetric.rsa import rust_openssl
 
+# pybase64 provides SIMD-accelerated base64 codecs, with the same API as the
+# standard library. It speeds up the import/export of big PEM objects.
+try:
+    import pybase64
+    _b64encode = pybase64.b64encode
+    _b64decode = pybase64.b64decode
+except ImportError:
+    _b64encode = base64.b64encode
+    _b64decode = base64.b64decode
+
 
 # Maximum allowed size in bytes for a certificate file, to avoid
 # loading huge file when importing a cert
@@ -99,13 +155,18 @@ _MAX_CRL_SIZE = 10 * 1024 * 1024   # some are that big
 @conf.commands.register
 def der2pem(der_string, obj="UNKNOWN"):
     """Convert DER octet string to PEM format (with optional header)"""
+    return der2pem_bytes(der_string, obj).decode()
+
+
+def der2pem_bytes(der_string, obj="UNKNOWN"):
+    """Same as der2pem(), but return the PEM format as bytes"""
     # Encode a byte string in PEM format. Header advertises <obj> type.
-    pem_string = "-----BEGIN %s-----\n" % obj
-    base64_string = base64.b64encode(der_string).decode()
-    chunks = [base64_string[i:i + 64] for i in range(0, len(base64_string), 64)]  # noqa: E501
-    pem_string += '\n'.join(chunks)
-    pem_string += "\n-----END %s-----\n" % obj
-    return pem_string
+    # The armor lines and the 64-column base64 lines are joined at once.
+    b64 = _b64encode(der_string)
+    lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+    lines.insert(0, b"-----BEGIN %s-----" % obj.encode())
+    lines.append(b"-----END %s-----\n" % obj.encode())
+    return b"\n".join(lines)
 
 
 @conf.commands.register
@@ -117,31 +178,110 @@ def pem2der(pem_string):
     if pem_string.find(b"-----BEGIN", first_idx) != -1:
         raise Exception("pem2der() expects only one PEM-encoded object")
     last_idx = pem_string.rfind(b"-----", 0, pem_string.rfind(b"-----"))
-    base64_string = pem_string[first_idx:last_idx]
-    base64_string.replace(b"\n", b"")
-    der_string = base64.b64decode(base64_string)
+    # Strip the line breaks at once, so that the decoder processes a
+    # contiguous base64 buffer.
+    base64_string = pem_string[first_idx:last_idx].translate(None, b"\n ")
+    der_string = _b64decode(base64_string)
     return der_string
 
 
+# Matches a whole PEM object, from its BEGIN tag to the end of the line of
+# its END tag (if any). The first group is the base64 body: it is matched
+# by runs of non '-' characters rather than with a lazy '.*?', which would
+# try to match the END tag at every single byte.
+_PEM_RE = re.compile(
+    rb"-----BEGIN[^\n]*\n([^-]*(?:-(?!----END)[^-]*)*)-----END[^\n]*(?:\n|\Z)"
+)
+
+
+def _iter_pem(s):
+    """
+    Iterate over the PEM objects of 's' in a single pass, yielding the
+    _PEM_RE match of each of them.
+    """
+    end_idx = 0
+    for m in _PEM_RE.finditer(s):
+        yield m
+        end_idx = m.end()
+    if s.find(b"-----BEGIN", end_idx) != -1:
+        raise Exception("Invalid PEM object (missing END tag)")
+
+
+def _iter_pem_der(s):
+    """
+    Iterate over the PEM objects of 's' in a single pass, yielding the
+    DER encoding of each of them. The base64 bodies are decoded as they are
+    found, instead of splitting the objects then scanning them again.
+    """
+    for m in _iter_pem(s):
+        yield _b64decode(m.group(1).translate(None, b"\r\n "))
+
+
+def split_pem_iter(s):
+    """
+    Iterate over PEM objects. Same as split_pem(), without building
+    the list of all the objects first.
+    """
+    for m in _iter_pem(s):
+        yield m.group(0)
+
+
 def split_pem(s):
     """
     Split PEM objects. Useful to process concatenated certificates.
     """
-    pem_strings = []
-    while s != b"":
-        start_idx = s.find(b"-----BEGIN")
-        if start_idx == -1:
-            break
-        end_idx = s.find(b"-----END")
-        if end_idx == -1:
-            raise Exception("Invalid PEM object (missing END tag)")
-        end_idx = s.find(b"\n", end_idx) + 1
-        if end_idx == 0:
-            # There is no final \n
-            end_idx = len(s)
-        pem_strings.append(s[start_idx:end_idx])
-        s = s[end_idx:]
-    return pem_strings
+    return list(split_pem_iter(s))
+
+
+def _der_tlv(s, i):
+    """
+    Return the (start, end) indexes of the contents of the DER-encoded
+    element at s[i:].
+    """
+    i += 1
+    if s[i - 1] & 0x1f == 0x1f:
+        # high tag number form
+        while s[i] & 0x80:
+            i += 1
+        i += 1
+    length = s[i]
+    i += 1
+    if length & 0x80:
+        n = length & 0x7f
+        if not n:
+            raise ValueError("Indefinite length is not DER")
+        length = int.from_bytes(s[i:i + n], "big")
+        i += n
+    if i + length > len(s):
+        raise ValueError("Truncated DER element")
+    return i, i + length
+
+
+def _der_split(s):
+    """
+    Return the list of the DER-encoded elements of the SEQUENCE at the
+    beginning of 's', as slices of 's'. Scapy rebuilds ASN.1 packets from
+    their fields at every raw() call, so this is the cheap way to retrieve
+    the original encoding of some fields.
+    """
+    i, end = _der_tlv(s, 0)
+    items = []
+    while i < end:
+        _, item_end = _der_tlv(s, i)
+        items.append(s[i:item_end])
+        i = item_end
+    return items
+
+
+def _is_der(s):
+    """
+    True if 's' is exactly one DER-encoded SEQUENCE. This is checked from
+    the first bytes only, sparing a scan of big DER objects for PEM tags.
+    """
+    try:
+        return s[:1] == b"\x30" and _der_tlv(s, 0)[1] == len(s)
+    except (IndexError, ValueError):
+        return False
 
 
 class _PKIObj(object):
@@ -164,24 +304,34 @@ class _PKIObjMaker(type):
             raise Exception(error_msg)
         obj_path = bytes_encode(obj_path)
 
-        if (b'\x00' not in obj_path) and os.path.isfile(obj_path):
-            _size = os.path.getsize(obj_path)
-            if _size > obj_max_size:
-                raise Exception(error_msg)
+        # obj_path is either a path to a regular file or the data itself.
+        # The file is opened first, then checked with fstat(), which costs
+        # fewer syscalls than isfile() + getsize() and is not racy.
+        _raw = obj_path
+        if b'\x00' not in obj_path:
+            # O_NONBLOCK: do not hang on FIFOs, which are not read anyway
+            flags = (os.O_RDONLY | getattr(os, "O_BINARY", 0) |
+                     getattr(os, "O_NONBLOCK", 0))
             try:
-                with open(obj_path, "rb") as f:
-                    _raw = f.read()
-            except Exception:
-                raise Exception(error_msg)
-        else:
-            _raw = obj_path
+                fd = os.open(obj_path, flags)
+            except OSError:
+                fd = None
+            if fd is not None:
+                try:
+                    st = os.fstat(fd)
+                    if stat.S_ISREG(st.st_mode):
+                        if st.st_size > obj_max_size:
+                            raise Exception(error_msg)
+                        _raw = os.read(fd, st.st_size)
+                except OSError:
+                    raise Exception(error_msg)
+                finally:
+                    os.close(fd)
 
         try:
-            if b"-----BEGIN" in _raw:
+            if not _is_der(_raw) and b"-----BEGIN" in _raw:
                 frmt = "PEM"
-                pem = _raw
-                der_list = split_pem(pem)
-                der = b''.join(map(pem2der, der_list))
+                der = b''.join(_iter_pem_der(_raw))
             else:
                 frmt = "DER"
                 der = _raw
@@ -241,19 +391,10 @@ class _PubKeyFactory(_PKIObjMaker):
         obj = _PKIObjMaker.__call__(cls, key_path, _MAX_KEY_SIZE)
         try:
             spki = X509_SubjectPublicKeyInfo(obj._der)
-            pubkey = spki.subjectPublicKey
-            if isinstance(pubkey, RSAPublicKey):
-                obj.__class__ = PubKeyRSA
-                obj.import_from_asn1pkt(pubkey)
-            elif isinstance(pubkey, ECDSAPublicKey):
-                obj.__class__ = PubKeyECDSA
-                obj.import_from_der(obj._der)
-            elif isinstance(pubkey, EdDSAPublicKey):
-                obj.__class__ = PubKeyEdDSA
-                obj.import_from_der(obj._der)
-            else:
-                raise
-            obj.marker = "PUBLIC KEY"
+            PubKey._import_spki(obj, spki, obj._der)
+            if _der_tlv(obj._der, 0)[1] == len(obj._der):
+                # This is already the SubjectPublicKeyInfo encoding
+                obj._der_cache = (obj.pubkey, obj._der)
         except Exception:
             try:
                 pubkey = RSAPublicKey(obj._der)
@@ -274,24 +415,93 @@ class PubKey(metaclass=_PubKeyFactory):
     Provides common verifyCert() and export() methods.
     """
 
+    @classmethod
+    def from_spki(cls, spki, der=None):
+        """
+        Build a PubKey from an X509_SubjectPublicKeyInfo which has already
+        been dissected, e.g. as part of a certificate. 'der' may be provided
+        as its original encoding, to spare a rebuild of the packet.
+        """
+        if der is None:
+            der = raw(spki)
+        obj = type.__call__(cls)
+        obj.frmt = "DER"
+        PubKey._import_spki(obj, spki, der)
+        obj._der_cache = (obj.pubkey, der)
+        return obj
+
+    @staticmethod
+    def _import_spki(obj, spki, der):
+        # Cast 'obj' to the appropriate class and import the key from the
+        # dissected X509_SubjectPublicKeyInfo 'spki', whose encoding is 'der'.
+        pubkey = spki.subjectPublicKey
+        if isinstance(pubkey, RSAPublicKey):
+            obj.__class__ = PubKeyRSA
+            obj.import_from_asn1pkt(pubkey)
+        elif isinstance(pubkey, ECDSAPublicKey):
+            obj.__class__ = PubKeyECDSA
+            obj._import_from_spki(spki, der)
+        elif isinstance(pubkey, EdDSAPublicKey):
+            obj.__class__ = PubKeyEdDSA
+            obj._import_from_spki(spki, der)
+        else:
+            raise Exception("Unable to import public key")
+        obj.marker = "PUBLIC KEY"
+
+    @crypto_validator
+    def _import_from_spki(self, spki, der):
+        # Build the key from its bits for the usual named curves and EdDSA,
+        # with the algorithm already dissected. Anything else (e.g. explicit
+        # curves) is left to import_from_der().
+        alg = spki.signatureAlgorithm
+        oid = alg.algorithm.val
+        try:
+            if oid == "1.2.840.10045.2.1":  # ecPublicKey
+                oid = alg.parameters.val
+            loader = _SPKI_LOADERS.get(oid)
+        except AttributeError:
+            loader = None
+        if loader is not None:
+            bits = _der_split(der)[1]
+            start, end = _der_tlv(bits, 0)
+            # The first content octet is the number of unused bits
+            if bits[start:start + 1] == b"\x00":
+                try:
+                    self.pubkey = loader(bits[start + 1:end])
+                    return
+                except ValueError:
+                    pass
+        self.import_from_der(der)
+
     def verifyCert(self, cert):
         """ Verifies either a Cert or an X509_Cert. """
         tbsCert = cert.tbsCertificate
         sigAlg = tbsCert.signature
-        h = hash_by_oid[sigAlg.algorithm.val]
+        oid = sigAlg.algorithm.val
+        h = _SIGALG_TO_HASHOBJ.get(oid) or hash_by_oid[oid]
         sigVal = raw(cert.signatureValue)
         return self.verify(raw(tbsCert), sigVal, h=h, t='pkcs')
 
     @property
     def pem(self):
-        return der2pem(self.der, self.marker)
+        der = self.der
+        cache = getattr(self, "_pem_cache", None)
+        if cache is None or cache[0] is not der or cache[1] != self.marker:
+            cache = (der, self.marker, der2pem(der, self.marker))
+            self._pem_cache = cache
+        return cache[2]
 
     @property
     def der(self):
-        return self.pubkey.public_bytes(
-            encoding=serialization.Encoding.DER,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo,
-        )
+        # The encoding is kept for as long as the key object is the same
+        cache = getattr(self, "_der_cache", None)
+        if cache is None or cache[0] is not self.pubkey:
+            cache = (self.pubkey, self.pubkey.public_bytes(
+                encoding=serialization.Encoding.DER,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo,
+            ))
+            self._der_cache = cache
+        return cache[1]
 
     def public_numbers(self, *args, **kwargs):
         return self.pubkey.public_numbers(*args, **kwargs)
@@ -313,7 +523,7 @@ class PubKey(metaclass=_PubKeyFactory):
             if fmt == "DER":
                 return f.write(self.der)
             elif fmt == "PEM":
-                return f.write(self.pem.encode())
+                return f.write(der2pem_bytes(self.der, self.marker))
 
 
 class PubKeyRSA(PubKey, _EncryptAndVerifyRSA):
@@ -322,9 +532,26 @@ class PubKeyRSA(PubKey, _EncryptAndVerifyRSA):
     Use the 'key' attribute to access original object.
     """
     @crypto_validator
-    def fill_and_store(self, modulus=None, modulusLen=None, pubExp=None):
+    def fill_and_store(self, modulus=None, modulusLen=None, pubExp=None,
+                       synthetic=False):
+        """
+        If no modulus is provided, a new key is generated. With 'synthetic',
+        the modulus is a random odd integer instead, which is much faster
+        to get but has no known factorization: only use it when a valid
+        looking public key is needed (e.g. for tests or fuzzing).
+        """
         pubExp = pubExp or 65537
-        if not modulus:
+        if not modulus and synthetic:
+            real_modulusLen = modulusLen or 2048
+            while True:
+                # top two bits set, as for a product of two primes
+                modulus = (random.getrandbits(real_modulusLen) |
+                           (3 << (real_modulusLen - 2)) | 1)
+                if math.gcd(modulus, pubExp) == 1:
+                    break
+            pubNum = rsa.RSAPublicNumbers(n=modulus, e=pubExp)
+            self.pubkey = pubNum.public_key(_BACKEND)
+        elif not modulus:
             real_modulusLen = modulusLen or 2048
             if real_modulusLen < 1024 and not _RSA_512_SUPPORTED:
                 # cryptography > 43.0 compatibility
@@ -336,7 +563,7 @@ class PubKeyRSA(PubKey, _EncryptAndVerifyRSA):
                 private_key = rsa.generate_private_key(
                     public_exponent=pubExp,
                     key_size=real_modulusLen,
-                    backend=default_backend(),
+                    backend=_BACKEND,
                 )
             self.pubkey = private_key.public_key()
         else:
@@ -344,7 +571,7 @@ class PubKeyRSA(PubKey, _EncryptAndVerifyRSA):
             if modulusLen and real_modulusLen != modulusLen:
                 warning("modulus and modulusLen do not match!")
             pubNum = rsa.RSAPublicNumbers(n=modulus, e=pubExp)
-            self.pubkey = pubNum.public_key(default_backend())
+            self.pubkey = pubNum.public_key(_BACKEND)
 
         self.marker = "PUBLIC KEY"
 
@@ -354,14 +581,27 @@ class PubKeyRSA(PubKey, _EncryptAndVerifyRSA):
         self._modulus = pubNum.n
         self._pubExp = pubNum.e
 
+    @classmethod
+    def _from_cryptography(cls, pubkey, modulusLen):
+        """
+        Wrap an existing cryptography RSA public key, without rebuilding it
+        from its public numbers.
+        """
+        obj = cls(cryptography_obj=pubkey)
+        pubNum = pubkey.public_numbers()
+        obj._modulusLen = modulusLen
+        obj._modulus = pubNum.n
+        obj._pubExp = pubNum.e
+        return obj
+
     @crypto_validator
     def import_from_tuple(self, tup):
         # this is rarely used
         e, m, mLen = tup
-        if isinstance(m, bytes):
-            m = pkcs_os2ip(m)
-        if isinstance(e, bytes):
-            e = pkcs_os2ip(e)
+        if isinstance(m, (bytes, bytearray)):
+            m = int.from_bytes(m, "big")
+        if isinstance(e, (bytes, bytearray)):
+            e = int.from_bytes(e, "big")
         self.fill_and_store(modulus=m, pubExp=e)
 
     def import_from_asn1pkt(self, pubkey):
@@ -386,7 +626,7 @@ class PubKeyECDSA(PubKey):
     @crypto_validator
     def fill_and_store(self, curve=None):
         curve = curve or ec.SECP256R1
-        private_key = ec.generate_private_key(curve(), default_backend())
+        private_key = ec.generate_private_key(curve(), _BACKEND)
         self.pubkey = private_key.public_key()
 
     @crypto_validator
@@ -394,7 +634,7 @@ class PubKeyECDSA(PubKey):
         # No lib support for explicit curves nor compressed points.
         self.pubkey = serialization.load_der_public_key(
             pubkey,
-            backend=default_backend(),
+            backend=_BACKEND,
         )
 
     def encrypt(self, msg, h="sha256", **kwargs):
@@ -425,7 +665,7 @@ class PubKeyEdDSA(PubKey):
     def import_from_der(self, pubkey):
         self.pubkey = serialization.load_der_public_key(
             pubkey,
-            backend=default_backend(),
+            backend=_BACKEND,
         )
 
     def encrypt(self, msg, **kwargs):
@@ -532,14 +772,27 @@ class PrivKey(metaclass=_PrivKeyFactory):
         and then they keep the ones they're interested in.
         Here, t will be passed eventually to pkcs1._DecryptAndSignRSA.sign().
         """
+        return self._signTBSCert(tbsCert, h=h)[0]
+
+    def _signTBSCert(self, tbsCert, h="sha256"):
+        """
+        Same as signTBSCert(), but also return the DER encoding of the
+        result. It is assembled from the tbsCertificate encoding that was
+        signed, rather than by building the whole X509_Cert again.
+        """
         sigAlg = tbsCert.signature
         h = h or hash_by_oid[sigAlg.algorithm.val]
-        sigVal = self.sign(raw(tbsCert), h=h, t='pkcs')
+        tbs_der = raw(tbsCert)
+        sigVal = self.sign(tbs_der, h=h, t='pkcs')
         c = X509_Cert()
         c.tbsCertificate = tbsCert
         c.signatureAlgorithm = sigAlg
         c.signatureValue = _Raw_ASN1_BIT_STRING(sigVal, readable=True)
-        return c
+        # signatureValue is a BIT STRING without unused bits
+        der = (tbs_der + raw(sigAlg) +
+               b"\x03" + BER_len_enc(len(sigVal) + 1) + b"\x00" + sigVal)
+        der = b"\x30" + BER_len_enc(len(der)) + der
+        return c, der
 
     def resignCert(self, cert):
         """ Rewrite the signature of either a Cert or an X509_Cert. """
@@ -549,7 +802,8 @@ class PrivKey(metaclass=_PrivKeyFactory):
         """ Verifies either a Cert or an X509_Cert. """
         tbsCert = cert.tbsCertificate
         sigAlg = tbsCert.signature
-        h = hash_by_oid[sigAlg.algorithm.val]
+        oid = sigAlg.algorithm.val
+        h = _SIGALG_TO_HASHOBJ.get(oid) or hash_by_oid[oid]
         sigVal = raw(cert.signatureValue)
         return self.verify(raw(tbsCert), sigVal, h=h, t='pkcs')
 
@@ -559,11 +813,16 @@ class PrivKey(metaclass=_PrivKeyFactory):
 
     @property
     def der(self):
-        return self.key.private_bytes(
-            encoding=serialization.Encoding.DER,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        )
+        # The encoding is kept for as long as the key object is the same
+        cache = getattr(self, "_der_cache", None)
+        if cache is None or cache[0] is not self.key:
+            cache = (self.key, self.key.private_bytes(
+                encoding=serialization.Encoding.DER,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            ))
+            self._der_cache = cache
+        return cache[1]
 
     def export(self, filename, fmt=None):
         """
@@ -578,7 +837,7 @@ class PrivKey(metaclass=_PrivKeyFactory):
             if fmt == "DER":
                 return f.write(self.der)
             elif fmt == "PEM":
-                return f.write(self.pem.encode())
+                return f.write(der2pem_bytes(self.der, self.marker))
 
 
 class PrivKeyRSA(PrivKey, _DecryptAndSignRSA):
@@ -607,7 +866,7 @@ class PrivKeyRSA(PrivKey, _DecryptAndSignRSA):
                 self.key = rsa.generate_private_key(
                     public_exponent=pubExp,
                     key_size=real_modulusLen,
-                    backend=default_backend(),
+                    backend=_BACKEND,
                 )
             pubkey = self.key.public_key()
         else:
@@ -619,7 +878,7 @@ class PrivKeyRSA(PrivKey, _DecryptAndSignRSA):
                                             dmp1=exponent1, dmq1=exponent2,
                                             iqmp=coefficient, d=privExp,
                                             public_numbers=pubNum)
-            self.key = privNum.private_key(default_backend())
+            self.key = privNum.private_key(_BACKEND)
             pubkey = self.key.public_key()
 
         self.marker = "PRIVATE KEY"
@@ -630,7 +889,7 @@ class PrivKeyRSA(PrivKey, _DecryptAndSignRSA):
         self._modulus = pubNum.n
         self._pubExp = pubNum.e
 
-        self.pubkey = PubKeyRSA((pubNum.e, pubNum.n, real_modulusLen))
+        self.pubkey = PubKeyRSA._from_cryptography(pubkey, real_modulusLen)
 
     def import_from_asn1pkt(self, privkey):
         modulus = privkey.modulus.val
@@ -668,14 +927,14 @@ class PrivKeyECDSA(PrivKey):
     @crypto_validator
     def fill_and_store(self, curve=None):
         curve = curve or ec.SECP256R1
-        self.key = ec.generate_private_key(curve(), default_backend())
+        self.key = ec.generate_private_key(curve(), _BACKEND)
         self.pubkey = PubKeyECDSA(cryptography_obj=self.key.public_key())
         self.marker = "EC PRIVATE KEY"
 
     @crypto_validator
     def import_from_asn1pkt(self, privkey):
         self.key = serialization.load_der_private_key(raw(privkey), None,
-                                                      backend=default_backend())  # noqa: E501
+                                                      backend=_BACKEND)
         self.pubkey = PubKeyECDSA(cryptography_obj=self.key.public_key())
         self.marker = "EC PRIVATE KEY"
 
@@ -703,7 +962,7 @@ class PrivKeyEdDSA(PrivKey):
     @crypto_validator
     def import_from_asn1pkt(self, privkey):
         self.key = serialization.load_der_private_key(raw(privkey), None,
-                                                      backend=default_backend())  # noqa: E501
+                                                      backend=_BACKEND)
         self.pubkey = PubKeyECDSA(cryptography_obj=self.key.public_key())
         self.marker = "PRIVATE KEY"
 
@@ -726,9 +985,12 @@ class _CertMaker(_PKIObjMaker):
     but we reuse the model instead of creating redundant constructors.
     """
     def __call__(cls, cert_path):
-        obj = _PKIObjMaker.__call__(cls, cert_path,
-                                    _MAX_CERT_SIZE, "CERTIFICATE")
-        obj.__class__ = Cert
+        pki_obj = _PKIObjMaker.__call__(cls, cert_path,
+                                        _MAX_CERT_SIZE, "CERTIFICATE")
+        # Cert has __slots__, so the _PKIObj cannot be cast to it
+        obj = type.__call__(Cert)
+        obj.frmt = pki_obj.frmt
+        obj._der = pki_obj._der
         obj.marker = "CERTIFICATE"
         try:
             cert = X509_Cert(obj._der)
@@ -736,7 +998,7 @@ class _CertMaker(_PKIObjMaker):
             if conf.debug_dissector:
                 raise
             raise Exception("Unable to import certificate")
-        obj.import_from_asn1pkt(cert)
+        obj.import_from_asn1pkt(cert, der=obj._der)
         return obj
 
 
@@ -745,8 +1007,20 @@ class Cert(metaclass=_CertMaker):
     Wrapper for the X509_Cert from layers/x509.py.
     Use the 'x509Cert' attribute to access original object.
     """
-
-    def import_from_asn1pkt(self, cert):
+    __slots__ = ["frmt", "_der", "marker", "x509Cert", "tbsCertificate",
+                 "_pem_cache", "_issuer_der", "_subject_der",
+                 "version", "serial", "sigAlg",
+                 "issuer", "issuer_str", "issuer_hash",
+                 "subject", "subject_str", "subject_hash",
+                 "notBefore_str", "notBefore", "notAfter_str", "notAfter",
+                 "_notAfter_epoch", "pubKey", "_extensions",
+                 "signatureValue", "signatureLen"]
+
+    def import_from_asn1pkt(self, cert, der=None):
+        """
+        Fill in the attributes from the X509_Cert 'cert'. 'der' may be
+        provided as its original encoding, to spare a rebuild of the packet.
+        """
         error_msg = "Unable to import certificate"
 
         self.x509Cert = cert
@@ -754,6 +1028,22 @@ class Cert(metaclass=_CertMaker):
         tbsCert = cert.tbsCertificate
         self.tbsCertificate = tbsCert
 
+        if der is None:
+            der = raw(cert)
+        try:
+            tbs_items = _der_split(_der_split(der)[0])
+            if tbs_items[0][:1] == b"\xa0":
+                # explicit version tag
+                del tbs_items[0]
+            # Equal DER-encoded names are a fast accept in isIssuerCert().
+            # Their string forms decide otherwise, as the same name may be
+            # encoded with different string types.
+            self._issuer_der = tbs_items[2]
+            self._subject_der = tbs_items[4]
+            spki_der = tbs_items[5]
+        except (IndexError, ValueError):
+            raise Exception(error_msg)
+
         if tbsCert.version:
             self.version = tbsCert.version.val + 1
         else:
@@ -766,39 +1056,80 @@ class Cert(metaclass=_CertMaker):
         self.subject = tbsCert.get_subject()
         self.subject_str = tbsCert.get_subject_str()
         self.subject_hash = hash(self.subject_str)
-        self.authorityKeyID = None
 
         self.notBefore_str = tbsCert.validity.not_before.pretty_time
         try:
             self.notBefore = tbsCert.validity.not_before.datetime.timetuple()
         except ValueError:
             raise Exception(error_msg)
-        self.notBefore_str_simple = time.strftime("%x", self.notBefore)
 
         self.notAfter_str = tbsCert.validity.not_after.pretty_time
         try:
             self.notAfter = tbsCert.validity.not_after.datetime.timetuple()
         except ValueError:
             raise Exception(error_msg)
-        self.notAfter_str_simple = time.strftime("%x", self.notAfter)
+        # For remainingDays()
+        try:
+            self._notAfter_epoch = time.mktime(self.notAfter)
+        except (OverflowError, ValueError):
+            # out of the platform range, left to remainingDays()
+            self._notAfter_epoch = None
+
+        self.pubKey = PubKey.from_spki(tbsCert.subjectPublicKeyInfo,
+                                       der=spki_der)
 
-        self.pubKey = PubKey(raw(tbsCert.subjectPublicKeyInfo))
+        # Extensions are only looked into when first needed
+        self._extensions = None
+
+        self.signatureValue = raw(cert.signatureValue)
+        self.signatureLen = len(self.signatureValue)
 
-        if tbsCert.extensions:
-            for extn in tbsCert.extensions:
+    def _get_extension_attr(self, name):
+        if self._extensions is None:
+            extensions = {"authorityKeyID": None}
+            for extn in self.tbsCertificate.extensions or []:
                 if extn.extnID.oidname == "basicConstraints":
-                    self.cA = False
+                    extensions["cA"] = False
                     if extn.extnValue.cA:
-                        self.cA = not (extn.extnValue.cA.val == 0)
+                        extensions["cA"] = not (extn.extnValue.cA.val == 0)
                 elif extn.extnID.oidname == "keyUsage":
-                    self.keyUsage = extn.extnValue.get_keyUsage()
+                    extensions["keyUsage"] = extn.extnValue.get_keyUsage()
                 elif extn.extnID.oidname == "extKeyUsage":
-                    self.extKeyUsage = extn.extnValue.get_extendedKeyUsage()
+                    extensions["extKeyUsage"] = \
+                        extn.extnValue.get_extendedKeyUsage()
                 elif extn.extnID.oidname == "authorityKeyIdentifier":
-                    self.authorityKeyID = extn.extnValue.keyIdentifier.val
+                    extensions["authorityKeyID"] = \
+                        extn.extnValue.keyIdentifier.val
+            self._extensions = extensions
+        try:
+            return self._extensions[name]
+        except KeyError:
+            # the extension is absent
+            raise AttributeError(name)
 
-        self.signatureValue = raw(cert.signatureValue)
-        self.signatureLen = len(self.signatureValue)
+    @property
+    def cA(self):
+        return self._get_extension_attr("cA")
+
+    @property
+    def keyUsage(self):
+        return self._get_extension_attr("keyUsage")
+
+    @property
+    def extKeyUsage(self):
+        return self._get_extension_attr("extKeyUsage")
+
+    @property
+    def authorityKeyID(self):
+        return self._get_extension_attr("authorityKeyID")
+
+    @property
+    def notBefore_str_simple(self):
+        return time.strftime("%x", self.notBefore)
+
+    @property
+    def notAfter_str_simple(self):
+        return time.strftime("%x", self.notAfter)
 
     def isIssuerCert(self, other):
         """
@@ -806,10 +1137,19 @@ class Cert(metaclass=_CertMaker):
           - self.issuer == other.subject
           - self is signed by other
         """
-        if self.issuer_hash != other.subject_hash:
+        if (self._issuer_der != other._subject_der and
+                self.issuer_hash != other.subject_hash):
             return False
         return other.pubKey.verifyCert(self)
 
+    def find_issuer(self, index):
+        """
+        Return the Cert that issued 'self' among those of 'index', as
+        returned by build_issuer_index(), or None. Only the candidates
+        with a matching subject have their signature checked.
+        """
+        return _find_in_index(index, self.issuer_hash, self.isIssuerCert)
+
     def isSelfSigned(self):
         """
         Return True if the certificate is self-signed:
@@ -833,8 +1173,8 @@ class Cert(metaclass=_CertMaker):
         """
         tbsCert = self.tbsCertificate
         sigAlg = tbsCert.signature
-        h = hash_by_oid[sigAlg.algorithm.val]
-        return _get_hash(h)
+        oid = sigAlg.algorithm.val
+        return _SIGALG_TO_HASHOBJ.get(oid) or _get_hash(hash_by_oid[oid])
 
     def setSubjectPublicKeyFromPrivateKey(self, key):
         """
@@ -856,7 +1196,8 @@ class Cert(metaclass=_CertMaker):
         """
         Resign a certificate with a specific key
         """
-        self.import_from_asn1pkt(key.resignCert(self))
+        cert, der = key._signTBSCert(self.tbsCertificate, h=None)
+        self.import_from_asn1pkt(cert, der=der)
 
     def remainingDays(self, now=None):
         """
@@ -870,6 +1211,7 @@ class Cert(metaclass=_CertMaker):
 
          - '%b %d %H:%M:%S %Y %Z' e.g. 'Jan 30 07:38:59 2008 GMT'
          - '%m/%d/%y' e.g. '01/30/08' (less precise)
+         - ISO 8601 e.g. '2008-01-30T07:38:59'
 
         If the certificate is no more valid at the date considered, then
         a negative value is returned representing the number of days
@@ -879,19 +1221,30 @@ class Cert(metaclass=_CertMaker):
         case of certificates that are still just valid.
         """
         if now is None:
-            now = time.localtime()
+            now = time.time()
         elif isinstance(now, str):
+            # strptime() is slow, it is only used for the '%b' format
             try:
                 if '/' in now:
-                    now = time.strptime(now, '%m/%d/%y')
+                    month, day, year = now.split('/')
+                    if len(year) > 2:
+                        raise ValueError("Invalid year: %r" % year)
+                    now = datetime.datetime(_pivot_year(int(year)), int(month),
+                                            int(day)).timestamp()
+                elif now[:4].isdigit():
+                    now = datetime.datetime.fromisoformat(now).timestamp()
                 else:
-                    now = time.strptime(now, '%b %d %H:%M:%S %Y %Z')
+                    now = time.mktime(time.strptime(now,
+                                                    '%b %d %H:%M:%S %Y %Z'))
             except Exception:
                 warning("Bad time string provided, will use localtime() instead.")  # noqa: E501
-                now = time.localtime()
+                now = time.time()
+        else:
+            now = time.mktime(now)
 
-        now = time.mktime(now)
-        nft = time.mktime(self.notAfter)
+        nft = self._notAfter_epoch
+        if nft is None:
+            nft = time.mktime(self.notAfter)
         diff = (nft - now) / (24. * 3600)
         return diff
 
@@ -910,22 +1263,33 @@ class Cert(metaclass=_CertMaker):
         Also note that the check on the issuer is performed on the
         Authority Key Identifier if available in _both_ the CRL and the
         Cert. Otherwise, the issuers are simply compared.
+
+        A CRLIndex of the list may be provided instead of the list itself.
         """
+        if isinstance(crl_list, CRLIndex):
+            c = crl_list.find(self)
+            return c is not None and self.serial in c._revoked_serial_set
         for c in crl_list:
             if (self.authorityKeyID is not None and
                 c.authorityKeyID is not None and
                     self.authorityKeyID == c.authorityKeyID):
-                return self.serial in (x[0] for x in c.revoked_cert_serials)
+                return self.serial in c._revoked_serial_set
             elif self.issuer == c.issuer:
-                return self.serial in (x[0] for x in c.revoked_cert_serials)
+                return self.serial in c._revoked_serial_set
         return False
 
     @property
     def pem(self):
-        return der2pem(self.der, self.marker)
+        der = self.der
+        cache = getattr(self, "_pem_cache", None)
+        if cache is None or cache[0] != der or cache[1] != self.marker:
+            cache = (der, self.marker, der2pem(der, self.marker))
+            self._pem_cache = cache
+        return cache[2]
 
     @property
     def der(self):
+        # Not kept, as x509Cert may be edited in place
         return bytes(self.x509Cert)
 
     def export(self, filename, fmt=None):
@@ -941,7 +1305,7 @@ class Cert(metaclass=_CertMaker):
             if fmt == "DER":
                 return f.write(self.der)
             elif fmt == "PEM":
-                return f.write(self.pem.encode())
+                return f.write(der2pem_bytes(self.der, self.marker))
 
     def show(self):
         print("Serial: %s" % self.serial)
@@ -953,23 +1317,75 @@ class Cert(metaclass=_CertMaker):
         return "[X.509 Cert. Subject:%s, Issuer:%s]" % (self.subject_str, self.issuer_str)  # noqa: E501
 
 
+def build_issuer_index(certs):
+    """
+    Index a list of Cert by their subject_hash, for use with
+    Cert.find_issuer(). This spares a scan of the whole list for each
+    certificate whose issuer is searched for.
+    """
+    return _index_by(certs, "subject_hash")
+
+
+def _index_by(certs, attr):
+    # issuer_hash or subject_hash (as per 'attr') -> list of the certificates
+    # (or CRLs) with this issuer or subject. The hashes are those of the
+    # string forms of the names, so that names match whatever their string
+    # types. Collisions are left to isIssuerCert(), which compares the names.
+    index = {}
+    for c in certs:
+        index.setdefault(getattr(c, attr), []).append(c)
+    return index
+
+
+def _find_in_index(index, key, match, skip=()):
+    # Return the first element of 'index' under 'key' which is not in
+    # 'skip' (a set of ids) and for which match() is true, or None.
+    for c in index.get(key, ()):
+        if id(c) not in skip and match(c):
+            return c
+    return None
+
+
 ################################
 # Certificate Revocation Lists #
 ################################
 
+def _pivot_year(yy):
+    # Full year of a 2-digit year, with the same pivot as strptime('%y')
+    return yy + (1900 if yy >= 69 else 2000)
+
+
+def _parse_yymmddhhmmss(s):
+    """
+    Equivalent to time.strptime(s, "%y%m%d%H%M%S") for the UTCTime
+    values of CRLs, which are parsed in bulk: strptime is much slower.
+    Raise a ValueError if 's' is not a valid date.
+    """
+    if len(s) != 12 or not s.isdigit():
+        raise ValueError("Invalid UTCTime: %r" % s)
+    return datetime.datetime(_pivot_year(int(s[0:2])), int(s[2:4]),
+                             int(s[4:6]), int(s[6:8]), int(s[8:10]),
+                             int(s[10:12])).timetuple()
+
+
 class _CRLMaker(_PKIObjMaker):
     """
     Metaclass for CRL creation. It is not necessary as it was for the keys,
     but we reuse the model instead of creating redundant constructors.
     """
     def __call__(cls, cert_path):
-        obj = _PKIObjMaker.__call__(cls, cert_path, _MAX_CRL_SIZE, "X509 CRL")
-        obj.__class__ = CRL
+        pki_obj = _PKIObjMaker.__call__(cls, cert_path, _MAX_CRL_SIZE,
+                                        "X509 CRL")
+        # CRL has __slots__, so the _PKIObj cannot be cast to it
+        obj = type.__call__(CRL)
+        obj.frmt = pki_obj.frmt
+        obj._der = pki_obj._der
+        obj.marker = "X509 CRL"
         try:
             crl = X509_CRL(obj._der)
         except Exception:
             raise Exception("Unable to import CRL")
-        obj.import_from_asn1pkt(crl)
+        obj.import_from_asn1pkt(crl, der=obj._der)
         return obj
 
 
@@ -978,14 +1394,35 @@ class CRL(metaclass=_CRLMaker):
     Wrapper for the X509_CRL from layers/x509.py.
     Use the 'x509CRL' attribute to access original object.
     """
-
-    def import_from_asn1pkt(self, crl):
+    __slots__ = ["frmt", "_der", "marker", "x509CRL",
+                 "_pem_cache", "_issuer_der", "version", "sigAlg",
+                 "issuer", "issuer_str", "issuer_hash",
+                 "lastUpdate_str", "lastUpdate", "lastUpdate_str_simple",
+                 "nextUpdate_str", "nextUpdate", "nextUpdate_str_simple",
+                 "number", "authorityKeyID", "revoked_cert_serials",
+                 "_revoked_serial_set", "_tbsCertList", "_signatureValue"]
+
+    def import_from_asn1pkt(self, crl, der=None):
+        """
+        Fill in the attributes from the X509_CRL 'crl'. 'der' may be
+        provided as its original encoding, to spare a rebuild of the packet.
+        """
         error_msg = "Unable to import CRL"
 
         self.x509CRL = crl
 
         tbsCertList = crl.tbsCertList
-        self.tbsCertList = raw(tbsCertList)
+
+        if der is None:
+            der = raw(crl)
+        try:
+            tbs_items = _der_split(_der_split(der)[0])
+            if tbs_items[0][:1] == b"\x02":
+                # optional version
+                del tbs_items[0]
+            self._issuer_der = tbs_items[1]
+        except (IndexError, ValueError):
+            raise Exception(error_msg)
 
         if tbsCertList.version:
             self.version = tbsCertList.version.val + 1
@@ -1001,7 +1438,7 @@ class CRL(metaclass=_CRLMaker):
         if lastUpdate[-1] == "Z":
             lastUpdate = lastUpdate[:-1]
         try:
-            self.lastUpdate = time.strptime(lastUpdate, "%y%m%d%H%M%S")
+            self.lastUpdate = _parse_yymmddhhmmss(lastUpdate)
         except Exception:
             raise Exception(error_msg)
         self.lastUpdate_str_simple = time.strftime("%x", self.lastUpdate)
@@ -1014,36 +1451,60 @@ class CRL(metaclass=_CRLMaker):
             if nextUpdate[-1] == "Z":
                 nextUpdate = nextUpdate[:-1]
             try:
-                self.nextUpdate = time.strptime(nextUpdate, "%y%m%d%H%M%S")
+                self.nextUpdate = _parse_yymmddhhmmss(nextUpdate)
             except Exception:
                 raise Exception(error_msg)
             self.nextUpdate_str_simple = time.strftime("%x", self.nextUpdate)
 
+        self.authorityKeyID = None
         if tbsCertList.crlExtensions:
             for extension in tbsCertList.crlExtensions:
                 if extension.extnID.oidname == "cRLNumber":
                     self.number = extension.extnValue.cRLNumber.val
-
-        revoked = []
-        if tbsCertList.revokedCertificates:
-            for cert in tbsCertList.revokedCertificates:
-                serial = cert.serialNumber.val
-                date = cert.revocationDate.val
-                if date[-1] == "Z":
-                    date = date[:-1]
-                try:
-                    time.strptime(date, "%y%m%d%H%M%S")
-                except Exception:
-                    raise Exception(error_msg)
-                revoked.append((serial, date))
+                elif extension.extnID.oidname == "authorityKeyIdentifier":
+                    self.authorityKeyID = \
+                        extension.extnValue.keyIdentifier.val
+
+        # Built at once, as there may be many entries. The binding of
+        # 'date' through a 1-tuple avoids a second lookup of the field.
+        revoked = [(cert.serialNumber.val,
+                    date[:-1] if date[-1:] == "Z" else date)
+                   for cert in tbsCertList.revokedCertificates or ()
+                   for date in (cert.revocationDate.val,)]
+        # The dates are kept as strings, only check their format
+        if not all(len(date) == 12 and date.isdigit()
+                   for _, date in revoked):
+            raise Exception(error_msg)
         self.revoked_cert_serials = revoked
+        # For the membership tests of Cert.isRevoked()
+        self._revoked_serial_set = frozenset(serial for serial, _ in revoked)
 
-        self.signatureValue = raw(crl.signatureValue)
-        self.signatureLen = len(self.signatureValue)
+        # The encoded tbsCertList and signature are only built when needed
+        self._tbsCertList = None
+        self._signatureValue = None
+
+    @property
+    def tbsCertList(self):
+        if self._tbsCertList is None:
+            # Sliced from the encoding the CRL was imported from, as
+            # self.der would encode the whole CRL again.
+            self._tbsCertList = _der_split(self._der)[0]
+        return self._tbsCertList
+
+    @property
+    def signatureValue(self):
+        if self._signatureValue is None:
+            self._signatureValue = raw(self.x509CRL.signatureValue)
+        return self._signatureValue
+
+    @property
+    def signatureLen(self):
+        return len(self.signatureValue)
 
     def isIssuerCert(self, other):
         # This is exactly the same thing as in Cert method.
-        if self.issuer_hash != other.subject_hash:
+        if (self._issuer_der != other._subject_der and
+                self.issuer_hash != other.subject_hash):
             return False
         return other.pubKey.verifyCert(self)
 
@@ -1051,6 +1512,20 @@ class CRL(metaclass=_CRLMaker):
         # Return True iff the CRL is signed by one of the provided anchors.
         return any(self.isIssuerCert(a) for a in anchors)
 
+    @property
+    def pem(self):
+        der = self.der
+        cache = getattr(self, "_pem_cache", None)
+        if cache is None or cache[0] != der or cache[1] != self.marker:
+            cache = (der, self.marker, der2pem(der, self.marker))
+            self._pem_cache = cache
+        return cache[2]
+
+    @property
+    def der(self):
+        # Not kept, as x509CRL may be edited in place
+        return bytes(self.x509CRL)
+
     def show(self):
         print("Version: %d" % self.version)
         print("sigAlg: " + self.sigAlg)
@@ -1059,10 +1534,59 @@ class CRL(metaclass=_CRLMaker):
         print("nextUpdate: %s" % self.nextUpdate_str)
 
 
+class CRLIndex(object):
+    """
+    Index of a list of trusted CRL, by Authority Key Identifier and by
+    issuer. It may be passed to Cert.isRevoked() instead of the list, so
+    that checking many certificates does not scan the list for each one.
+    """
+
+    def __init__(self, crl_list):
+        # key -> (position in crl_list, CRL), for the first matching CRL
+        self.by_akid = {}
+        self.by_issuer = {}
+        for i, c in enumerate(crl_list):
+            if c.authorityKeyID is not None:
+                self.by_akid.setdefault(c.authorityKeyID, (i, c))
+            self.by_issuer.setdefault(c.issuer_str, (i, c))
+
+    def find(self, cert):
+        """
+        Return the CRL which Cert.isRevoked() would check 'cert' against
+        when given the list, i.e. the first one matching either its
+        Authority Key Identifier or its issuer, or None.
+        """
+        found = self.by_issuer.get(cert.issuer_str)
+        if cert.authorityKeyID is not None:
+            by_akid = self.by_akid.get(cert.authorityKeyID)
+            if by_akid is not None and (found is None or by_akid < found):
+                found = by_akid
+        return found and found[1]
+
+
 ######################
 # Certificate chains #
 ######################
 
+def _extend_chain(chain, by_issuer):
+    """
+    Append to 'chain' the elements of 'by_issuer' (as returned by
+    _index_by(certs, "issuer_hash")) which follow its last element by
+    issuer/subject matching and signature validity. 'by_issuer' is left
+    untouched, so that it may be walked from several starting points.
+    """
+    used = set()
+    while True:
+        tip = chain[-1]
+        c = _find_in_index(by_issuer, getattr(tip, "subject_hash", None),
+                           lambda cand: cand.isIssuerCert(tip), used)
+        if c is None:
+            # no new certificate appended to chain
+            return
+        used.add(id(c))
+        chain.append(c)
+
+
 class Chain(list):
     """
     Basically, an enhanced array of Cert.
@@ -1081,6 +1605,8 @@ class Chain(list):
 
         Note that we do not check AKID/{SKID/issuer/serial} matching,
         nor the presence of keyCertSign in keyUsage extension (if present).
+
+        The certList is left untouched.
         """
         list.__init__(self, ())
         if cert0:
@@ -1089,40 +1615,44 @@ class Chain(list):
             for root_candidate in certList:
                 if root_candidate.isSelfSigned():
                     self.append(root_candidate)
-                    certList.remove(root_candidate)
+                    certList = [c for c in certList
+                                if c is not root_candidate]
                     break
 
         if len(self) > 0:
-            while certList:
-                tmp_len = len(self)
-                for c in certList:
-                    if c.isIssuerCert(self[-1]):
-                        self.append(c)
-                        certList.remove(c)
-                        break
-                if len(self) == tmp_len:
-                    # no new certificate appended to self
-                    break
+            # Only the candidates issued by the last element of the chain
+            # get their signature checked.
+            _extend_chain(self, _index_by(certList, "issuer_hash"))
 
     def verifyChain(self, anchors, untrusted=None):
         """
         Perform verification of certificate chains for that certificate.
-        A list of anchors is required. The certificates in the optional
-        untrusted list may be used as additional elements to the final chain.
+        A list (or any iterable, gone through once) of anchors is required.
+        The certificates in the optional untrusted list may be used as
+        additional elements to the final chain.
         On par with chain instantiation, only one chain constructed with the
         untrusted candidates will be retained. Eventually, dates are checked.
+        Anchors are tried in order, the first valid chain is returned.
         """
         untrusted = untrusted or []
+        # The candidates are indexed once for all the anchors
+        candidates = self + untrusted
+        by_issuer = _index_by(candidates, "issuer_hash")
+        now = time.time()
         for a in anchors:
-            chain = Chain(self + untrusted, a)
+            # Anchors which did not issue any of the candidates would not
+            # get further than themselves.
+            if a.subject_hash not in by_issuer:
+                continue
+            chain = Chain([], a)
+            _extend_chain(chain, by_issuer)
             if len(chain) == 1:             # anchor only
                 continue
             # check that the chain does not exclusively rely on untrusted
             if any(c in chain[1:] for c in self):
-                for c in chain:
-                    if c.remainingDays() < 0:
-                        break
-                if c is chain[-1]:      # we got to the end of the chain
+                # _notAfter_epoch is None for dates out of the platform range
+                if all((c._notAfter_epoch or time.mktime(c.notAfter)) >= now
+                       for c in chain):
                     return chain
         return None
 
@@ -1138,7 +1668,8 @@ class Chain(list):
         except Exception:
             raise Exception("Could not read from cafile")
 
-        anchors = [Cert(c) for c in split_pem(ca_certs)]
+        # The anchors are only imported as verifyChain() gets to them
+        anchors = (Cert(der) for der in _iter_pem_der(ca_certs))
 
         untrusted = None
         if untrusted_file:
@@ -1147,7 +1678,7 @@ class Chain(list):
                     untrusted_certs = f.read()
             except Exception:
                 raise Exception("Could not read from untrusted_file")
-            untrusted = [Cert(c) for c in split_pem(untrusted_certs)]
+            untrusted = [Cert(der) for der in _iter_pem_der(untrusted_certs)]
 
         return self.verifyChain(anchors, untrusted)
 
@@ -1162,6 +1693,8 @@ class Chain(list):
         try:
             anchors = []
             for cafile in os.listdir(capath):
+                # The contents are passed, as Cert() would not read files
+                # over _MAX_CERT_SIZE (e.g. a bundle, as in /etc/ssl/certs)
                 with open(os.path.join(capath, cafile), "rb") as fd:
                     anchors.append(Cert(fd.read()))
         except Exception:
@@ -1174,7 +1707,7 @@ class Chain(list):
                     untrusted_certs = f.read()
             except Exception:
                 raise Exception("Could not read from untrusted_file")
-            untrusted = [Cert(c) for c in split_pem(untrusted_certs)]
+            untrusted = [Cert(der) for der in _iter_pem_der(untrusted_certs)]
 
         return self.verifyChain(anchors, untrusted)
 
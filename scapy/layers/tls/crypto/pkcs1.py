@@ -109,6 +109,9 @@ if conf.crypto_valid:
     }
 
     def _get_hash(hashStr):
+        if isinstance(hashStr, HashAlgorithm):
+            # already resolved, e.g. by cert.py
+            return hashStr
         try:
             return _hashes[hashStr]()
         except KeyError: